@@ -1,23 +1,128 @@
+# Import gevent and patch BEFORE importing anything else, so no module can bind
+# the blocking socket/ssl implementations first
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import logging
 import os
 import re
-from urllib.parse import urljoin, urlparse
+from collections import deque
+from functools import lru_cache
+from urllib.parse import quote, urljoin, urlparse
 import random
 
-# Import gevent and patch BEFORE importing other libraries
-import gevent.monkey
-gevent.monkey.patch_all()
+import gevent
+from gevent.lock import Semaphore
+from gevent.pool import Pool
+from locust import FastHttpUser, events, task, between
+from locust.runners import MasterRunner, WorkerRunner
+from geventhttpclient.useragent import UserAgent
+from lxml import etree
+import lxml.html
+
+try:
+    from ada_url import URL as _AdaURL
+except ImportError:
+    _AdaURL = None
+
+logger = logging.getLogger(__name__)
 
-from locust import HttpUser, task, between
-import requests
-from bs4 import BeautifulSoup
+# Bound once so the task hot paths skip the module attribute lookup
+_choice = random.choice
+_choices = random.choices
 
 
 # --- Configuration ---
 TARGET_HOST = os.getenv("TARGET_HOST", "https://docs.locust.io")
 
+# Set to crawl depth-first instead of breadth-first
+CRAWL_DEPTH_FIRST = os.getenv("CRAWL_DEPTH_FIRST", "").lower() in ("1", "true", "yes")
 
-# --- Lists for Test Data ---
-SEARCH_QUERIES = [
+# Set to stop crawling this many links away from the root page
+CRAWL_MAX_DEPTH = int(os.environ["CRAWL_MAX_DEPTH"]) if os.getenv("CRAWL_MAX_DEPTH") else None
+
+# Crawled pages are parsed as they stream in and cut off at this size
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+READ_CHUNK_BYTES = 16 * 1024
+
+# Characters left as-is when percent-encoding a crawled path. Everything else,
+# spaces and control characters included, is escaped the way ada-url escapes
+# pathnames, so a page gets the same path however the link to it is written.
+_PATH_SAFE_CHARS = "/%:@!$&'()*+,;=~[]|"
+
+# Navigation links repeat on almost every crawled page, so memoize URL handling.
+# The C++ WHATWG parser from the optional ada-url package is used when it is
+# installed; otherwise links are resolved with urllib.parse.
+if _AdaURL is not None:
+    @lru_cache(maxsize=8192)
+    def _resolve_link(base: str, href: str) -> tuple[str, str]:
+        """Resolve a link against the page it was found on, returning (netloc, path)."""
+        try:
+            url = _AdaURL(href, base)
+        except ValueError:
+            return "", ""
+        return url.host, url.pathname
+else:
+    @lru_cache(maxsize=8192)
+    def _resolve_link(base: str, href: str) -> tuple[str, str]:
+        """Resolve a link against the page it was found on, returning (netloc, path)."""
+        parsed_url = urlparse(urljoin(base, href))
+        return parsed_url.netloc, quote(parsed_url.path, safe=_PATH_SAFE_CHARS)
+
+# Shared by every crawl so users on the same host reuse pooled keep-alive
+# connections instead of paying a fresh TCP/TLS handshake each time.
+# geventhttpclient keeps per-request overhead low; UserAgent adds redirect
+# handling on top of the raw HTTPClient.
+_CRAWLER = UserAgent(
+    max_retries=0,
+    headers={
+        "User-Agent": "Locust-Crawler/1.0",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        # Servers that honour ranges stop at the page size cap themselves, so
+        # the connection can go back to the pool instead of being cut off
+        "Range": f"bytes=0-{MAX_PAGE_BYTES - 1}",
+    },
+    concurrency=50,
+    connection_timeout=10,
+    network_timeout=30,
+    insecure=False,  # Set to True if you have SSL issues
+)
+
+# Built once; these run against every discovered link.
+# Paths with one of these extensions are recorded as assets and never fetched
+# by the crawler, so the set also lists documents, archives and media that
+# are unlikely to be HTML.
+_STATIC_EXTENSIONS = frozenset({
+    "css", "js", "png", "jpg", "jpeg", "gif", "svg", "ico", "woff", "woff2",
+    "ttf", "eot", "pdf", "zip", "gz", "mp4", "webm", "xml", "json", "txt",
+    "map", "webp", "avif",
+    "rss", "atom", "csv", "doc", "docx", "xls", "xlsx", "ppt", "pptx", "odt",
+    "ods", "epub", "rtf",
+    "tar", "tgz", "bz2", "xz", "7z", "rar", "dmg", "exe", "msi", "iso", "apk",
+    "jar", "whl",
+    "mp3", "ogg", "wav", "flac", "m4a", "avi", "mov", "mkv", "m4v", "bmp",
+    "tif", "tiff", "heic",
+})
+# Path segments that identify a single record. Pages that differ only in
+# these hit the same endpoint, so the crawl keeps one of them.
+_VARIABLE_SEGMENTS = (
+    (re.compile(r"/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?=/|$)", re.IGNORECASE), "/{uuid}"),
+    (re.compile(r"/\d{4}-\d{2}-\d{2}(?=/|$)"), "/{date}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{id}"),
+    (re.compile(r"/[0-9a-f]{16,}(?=/|$)", re.IGNORECASE), "/{token}"),
+)
+_SEARCH_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (r'/search', r'/catalogsearch', r'/find', r'/s/', r'\?.*[qs]=')
+)
+
+# Link extraction runs in libxml2 rather than in a pure-Python parser
+_PAGE_LINKS = etree.XPath("//a/@href", smart_strings=False)
+_ASSET_LINKS = etree.XPath("//img/@src | //link/@href | //script/@src", smart_strings=False)
+
+
+# --- Test Data ---
+SEARCH_QUERIES = (
     # Original Terms
     "shirt", "shoes", "pants", "jacket", "hat", "socks", "dress", "gear",
     # 100+ New Apparel Terms
@@ -40,16 +145,16 @@ SEARCH_QUERIES = [
     "graphic tee", "tunic", "camisole", "bodysuit", "Ankle boots",
     "Chelsea boots", "hiking boots", "running shoes", "cross-trainers",
     "espadrilles", "wedges", "pumps", "oxfords", "derby shoes", "clogs"
-]
+)
 
 # Fixed: Added missing GENERIC_SEARCH_TERMS
-GENERIC_SEARCH_TERMS = [
+GENERIC_SEARCH_TERMS = (
     "documentation", "guide", "tutorial", "help", "api", "install", "setup",
     "configuration", "examples", "quickstart", "getting started", "reference",
     "faq", "troubleshooting", "changelog", "release", "download", "support"
-]
+)
 
-COLORS = [
+COLORS = (
     # Original Colors
     "red", "blue", "green", "black", "white", "yellow", "purple",
     # Expanded List of Colors
@@ -59,108 +164,161 @@ COLORS = [
     "crimson", "scarlet", "pink", "magenta", "fuchsia", "lavender",
     "violet", "indigo", "orange", "gold", "coral", "salmon", "peach",
     "khaki", "plum", "mustard", "ochre", "rose gold", "bronze", "copper"
-]
+)
 
-SIZES = [
+SIZES = (
     "XS", "S", "M", "L", "XL", "XXL", "123", "456", "789", "987", "654", "321"
-]
-
-
-class WebsiteUser(HttpUser):
+)
+
+# Percent-encode the terms once here rather than on every request
+SEARCH_QUERIES = tuple(quote(term) for term in SEARCH_QUERIES)
+GENERIC_SEARCH_TERMS = tuple(quote(term) for term in GENERIC_SEARCH_TERMS)
+COLORS = tuple(quote(color) for color in COLORS)
+SIZES = tuple(quote(size) for size in SIZES)
+
+# A mix of generic and ecommerce terms for sites without a detected search
+MIXED_SEARCH_TERMS = GENERIC_SEARCH_TERMS + SEARCH_QUERIES[:10]
+
+# Random pages and filter values are drawn in batches of this size
+SAMPLE_BATCH_SIZE = 256
+
+# Search URL templates used when no search pattern was detected,
+# filled in with str.format(query=..., color=..., size=...)
+COMMON_SEARCH_TEMPLATES = (
+    "/search?q={query}",
+    "/search/?query={query}",
+    "/?s={query}",
+    "/s/{query}",
+    "/find?q={query}",
+    "/catalogsearch/result/?q={query}"
+)
+
+ECOMMERCE_SEARCH_TEMPLATES = (
+    "/catalogsearch/result/?q={query}",
+    "/search?q={query}&color={color}&size={size}",
+    "/products/search?query={query}&filters[color]={color}",
+    "/shop?search={query}&color={color}&size={size}"
+)
+
+
+class WebsiteUser(FastHttpUser):
     """
     A user class that simulates a user browsing a website.
 
-    This user will first crawl the website to discover internal URLs on start,
-    and then randomly visit those discovered URLs as its main task.
+    The website is crawled once per host to discover internal URLs, normally
+    when the test starts (see on_test_start below); users then randomly visit
+    the discovered URLs as their main task.
     """
     wait_time = between(1, 2)
     host = TARGET_HOST
 
+    # Defaults until on_start fills these in from the crawl results
+    discovered_urls: list[str] = []
+    static_assets: list[str] = []
+    search_info: dict = {'has_search': False}
+
+    # Crawl results shared by all users: host -> (pages, static assets, search info)
+    _crawl_cache: dict[str, tuple[list[str], list[str], dict]] = {}
+    _crawl_lock = Semaphore()
+
     def on_start(self):
         """
-        Called when a user is started. This is where we'll crawl the site.
+        Called when a user is started. Picks up the crawl results for this
+        host, crawling the site only if that has not happened yet.
         """
-        print(f"Starting crawl on {self.host}")
-        try:
-            self.discovered_urls, self.static_assets = self._crawl_website(self.host)
-            self.search_info = self._detect_search_patterns()
+        self.discovered_urls, self.static_assets, self.search_info = self.get_crawl_results(self.host)
+        self._build_search_templates()
+        self._page_batch = []
+        self._filter_batch = []
+        if self.search_info.get('has_search'):
+            self._do_basic_search = self._perform_detected_search
+            self._do_filtered_search = self._perform_filtered_search
+        else:
+            self._do_basic_search = self._perform_common_search_patterns
+            self._do_filtered_search = self._perform_ecommerce_search
+
+    @classmethod
+    def get_crawl_results(cls, host: str) -> tuple[list[str], list[str], dict]:
+        """
+        Return the (page URLs, static asset URLs, search info) for a host,
+        crawling it on first use.
+        """
+        with cls._crawl_lock:
+            if host not in cls._crawl_cache:
+                cls._crawl_cache[host] = cls._discover_site(host)
+            return cls._crawl_cache[host]
 
-            if not self.discovered_urls:
-                print("Warning: No URLs discovered. Adding root path.")
-                self.discovered_urls = ["/"]
+    @classmethod
+    def _discover_site(cls, host: str) -> tuple[list[str], list[str], dict]:
+        """
+        Crawl the site and detect its search patterns.
+        """
+        logger.info("Starting crawl on %s", host)
+        try:
+            discovered_urls, static_assets = cls._crawl_website(
+                host, depth_first=CRAWL_DEPTH_FIRST, max_depth=CRAWL_MAX_DEPTH
+            )
+            discovered_urls = cls._dedupe_variable_paths(discovered_urls)
+            search_info = cls._detect_search_patterns(discovered_urls)
+
+            if not discovered_urls:
+                logger.warning("No URLs discovered. Adding root path.")
+                discovered_urls = ["/"]
             else:
-                print(f"Discovered {len(self.discovered_urls)} URLs and {len(self.static_assets)} static assets.")
-                print(f"Search patterns detected: {self.search_info}")
+                logger.info("Discovered %d URLs and %d static assets.", len(discovered_urls), len(static_assets))
+                logger.info("Search patterns detected: %s", search_info)
         except Exception as e:
-            print(f"Error during crawling: {e}")
-            self.discovered_urls = ["/"]
-            self.static_assets = []
-            self.search_info = {'has_search': False}
+            logger.error("Error during crawling: %s", e)
+            discovered_urls = ["/"]
+            static_assets = []
+            search_info = {'has_search': False}
 
-    def _crawl_website(self, base_url: str, max_pages: int = 50000) -> tuple[list[str], list[str]]:
+        return discovered_urls, static_assets, search_info
+
+    @classmethod
+    def _crawl_website(cls, base_url: str, max_pages: int = 50000,
+                       concurrency: int = 10, depth_first: bool = False,
+                       max_depth: int | None = None) -> tuple[list[str], list[str]]:
         """
         Crawls a website to find all unique, internal URLs and static assets.
-        Uses a breadth-first approach to discover as many URLs as possible.
+        Uses a breadth-first approach by default to discover as many URLs as possible,
+        with up to `concurrency` pages being fetched and parsed at any time.
 
         Args:
             base_url: The starting URL to crawl.
             max_pages: Maximum number of pages to crawl to prevent infinite loops.
+            concurrency: Number of pages fetched in parallel.
+            depth_first: Take the newest paths off the frontier first, which
+                reaches deep pages sooner when max_pages cuts the crawl short.
+            max_depth: Do not crawl pages more than this many links away from
+                the root. Links on the deepest pages are still recorded.
 
         Returns:
             A tuple of (page URLs, static asset URLs).
         """
         discovered_paths = set(["/"])
         static_assets = set()
-        to_crawl = ["/"]
-        crawled_urls = set()  # Track what we've already crawled
-        base_netloc = urlparse(base_url).netloc
-
-        # Use a session for better connection reuse
-        session = requests.Session()
-        session.headers.update({
-            "User-Agent": "Locust-Crawler/1.0",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-        })
-
-        # Set reasonable timeouts
-        session.timeout = (10, 30)  # (connect, read) timeouts
-        session.verify = True  # Set to False if you have SSL issues
-
-        crawled_count = 0
-
-        while to_crawl and crawled_count < max_pages:
-            path = to_crawl.pop(0)
-
-            # Skip if we've already crawled this URL
-            if path in crawled_urls:
-                continue
-
-            crawled_urls.add(path)
-            crawled_count += 1
+        to_crawl = deque([("/", 0)])  # (path, link depth from the root)
+        seen = set(["/"])  # Every path already queued or classified as an asset
+        base_netloc = _resolve_link(base_url, "/")[0]
+        pool = Pool(concurrency)
+        next_path = to_crawl.pop if depth_first else to_crawl.popleft
+
+        def crawl_page(path: str, depth: int):
+            # Runs in a pool greenlet; link handling never yields, so the
+            # shared sets and frontier need no locking
+            full_url = urljoin(base_url, path)
+            doc = cls._fetch_page(full_url)
+            if doc is None:
+                return
 
             try:
-                full_url = urljoin(base_url, path)
-                print(f"Crawling ({crawled_count}/{max_pages}): {path}")
-
-                response = session.get(full_url)
-                response.raise_for_status()
-
-                # Only parse HTML content for further crawling
-                content_type = response.headers.get('content-type', '').lower()
-                if 'text/html' not in content_type:
-                    continue
-
-            except Exception as e:
-                print(f"Crawler request failed for {path}: {e}")
-                continue
-
-            try:
-                soup = BeautifulSoup(response.text, "html.parser")
                 new_urls_found = 0
+                crawl_links = max_depth is None or depth < max_depth
 
                 # Find all links
-                for link in soup.find_all("a", href=True):
-                    href = link['href'].strip()
+                for href in _PAGE_LINKS(doc):
+                    href = href.strip()
 
                     # Clean up the URL
                     if "#" in href:
@@ -169,53 +327,137 @@ class WebsiteUser(HttpUser):
                         continue
 
                     # Make URL absolute and parse it
-                    absolute_url = urljoin(full_url, href)
-                    parsed_url = urlparse(absolute_url)
+                    netloc, link_path = cls._split_link(full_url, base_netloc, href)
 
                     # Check if it's an internal link and we haven't seen it before
-                    if (parsed_url.netloc == base_netloc and
-                        parsed_url.path and
-                        parsed_url.path not in discovered_paths and
-                        parsed_url.path not in static_assets and
-                        parsed_url.path not in crawled_urls):
-
-                        if self._is_static_asset(parsed_url.path):
-                            static_assets.add(parsed_url.path)
+                    if (netloc == base_netloc and
+                        link_path and
+                        link_path not in seen):
+
+                        seen.add(link_path)
+                        if cls._is_static_asset(link_path):
+                            static_assets.add(link_path)
                         else:
-                            discovered_paths.add(parsed_url.path)
-                            # Add to crawling queue - increased limit for better discovery
-                            if len(to_crawl) < 2000:
-                                to_crawl.append(parsed_url.path)
+                            discovered_paths.add(link_path)
+                            if crawl_links:
+                                to_crawl.append((link_path, depth + 1))
                                 new_urls_found += 1
 
                 # Also collect static assets from img, link, and script tags
-                for tag in soup.find_all(['img', 'link', 'script']):
-                    src_attr = tag.get('src') or tag.get('href')
+                for src_attr in _ASSET_LINKS(doc):
                     if src_attr and not src_attr.startswith(('data:', 'javascript:')):
-                        absolute_url = urljoin(full_url, src_attr)
-                        parsed_url = urlparse(absolute_url)
-                        if parsed_url.netloc == base_netloc and parsed_url.path:
-                            static_assets.add(parsed_url.path)
+                        netloc, link_path = cls._split_link(full_url, base_netloc, src_attr)
+                        if netloc == base_netloc and link_path:
+                            seen.add(link_path)
+                            static_assets.add(link_path)
 
                 if new_urls_found > 0:
-                    print(f"  Found {new_urls_found} new URLs to crawl from {path}")
+                    logger.debug("Found %d new URLs to crawl from %s", new_urls_found, path)
 
             except Exception as e:
-                print(f"Error parsing HTML for {path}: {e}")
-                continue
+                logger.warning("Error parsing HTML for %s: %s", path, e)
 
-        session.close()
-        print(f"Crawling completed: {len(discovered_paths)} pages, {len(static_assets)} static assets")
+        crawled_count = 0
+
+        while crawled_count < max_pages:
+            if to_crawl:
+                path, depth = next_path()
+                crawled_count += 1
+                logger.debug("Crawling (%d/%d): %s", crawled_count, max_pages, path)
+                # Blocks while all `concurrency` fetchers are busy
+                pool.spawn(crawl_page, path, depth)
+            elif len(pool):
+                # Frontier is empty for now; wait for a running page to add links
+                gevent.wait(list(pool), count=1)
+            else:
+                break
+
+        pool.join()
+        logger.info("Crawling completed: %d pages, %d static assets", len(discovered_paths), len(static_assets))
         return list(discovered_paths), list(static_assets)
 
-    def _is_static_asset(self, path: str) -> bool:
+    @staticmethod
+    def _split_link(page_url: str, base_netloc: str, href: str) -> tuple[str, str]:
+        """
+        Return the (netloc, path) a link on page_url points to.
+        """
+        # Most links are root-relative: they stay on the site and their path is
+        # the href up to the query, so no URL parsing is needed. Paths with dot
+        # segments still go through the parser to be normalized.
+        if href.startswith("/") and not href.startswith("//") and "/." not in href:
+            return base_netloc, quote(href.split("?", 1)[0], safe=_PATH_SAFE_CHARS)
+        return _resolve_link(page_url, href)
+
+    @staticmethod
+    def _dedupe_variable_paths(paths: list[str]) -> list[str]:
+        """
+        Collapse paths that differ only in IDs, UUIDs, dates or tokens,
+        keeping one representative path for each endpoint.
+        """
+        representatives = {}
+        for path in paths:
+            key = path
+            for pattern, placeholder in _VARIABLE_SEGMENTS:
+                key = pattern.sub(placeholder, key)
+            representatives.setdefault(key, path)
+        return list(representatives.values())
+
+    @staticmethod
+    def _fetch_page(full_url: str):
+        """
+        Fetch a page for the crawler and parse it as the body streams in.
+
+        Returns the parsed document, or None if the page is not HTML or could
+        not be fetched. Bodies are read in chunks and fed straight to the
+        parser, so the full page never has to be held in memory as bytes.
+        """
+        try:
+            response = _CRAWLER.urlopen(full_url)
+
+            # Only parse HTML content for further crawling
+            content_type = response.headers.get('content-type', '').lower()
+            if 'text/html' not in content_type:
+                response.release()
+                return None
+
+            # The crawler does not send Accept-Encoding, so the body arrives
+            # uncompressed and can be fed to the parser as-is. libxml2 does the
+            # decoding, using the charset from the header when there is one,
+            # since it otherwise only looks at <meta> tags.
+            charset = content_type.partition('charset=')[2].split(';', 1)[0].strip(' "\'')
+            try:
+                parser = lxml.html.HTMLParser(encoding=charset or None)
+            except LookupError:
+                parser = lxml.html.HTMLParser()
+            received = 0
+            while received < MAX_PAGE_BYTES:
+                chunk = response.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                received += len(chunk)
+                parser.feed(chunk)
+            response.release()
+
+        except Exception as e:
+            logger.warning("Crawler request failed for %s: %s", full_url, e)
+            return None
+
+        try:
+            return parser.close()
+        except Exception as e:
+            logger.warning("Error parsing HTML for %s: %s", full_url, e)
+            return None
+
+    @staticmethod
+    def _is_static_asset(path: str) -> bool:
         """
         Check if a URL path points to a common static file type.
         """
-        static_extensions = r"\.(css|js|png|jpg|jpeg|gif|svg|ico|woff|woff2|ttf|eot|pdf|zip|gz|mp4|webm|xml|json|txt|map|webp|avif)$"
-        return bool(re.search(static_extensions, path, re.IGNORECASE))
+        dot = path.rfind(".")
+        return dot != -1 and path[dot + 1:].lower() in _STATIC_EXTENSIONS
 
-    def _detect_search_patterns(self) -> dict:
+    @staticmethod
+    def _detect_search_patterns(discovered_urls: list[str]) -> dict:
         """
         Analyze discovered URLs to detect search patterns.
         """
@@ -226,17 +468,9 @@ class WebsiteUser(HttpUser):
         }
 
         # Look for common search patterns in discovered URLs
-        search_patterns = [
-            r'/search',
-            r'/catalogsearch',
-            r'/find',
-            r'/s/',
-            r'\?.*[qs]='
-        ]
-
-        for url in self.discovered_urls:
-            for pattern in search_patterns:
-                if re.search(pattern, url, re.IGNORECASE):
+        for url in discovered_urls:
+            for pattern in _SEARCH_PATTERNS:
+                if pattern.search(url):
                     search_info['has_search'] = True
                     # Extract the base search path
                     base_path = url.split('?')[0]
@@ -244,7 +478,7 @@ class WebsiteUser(HttpUser):
                         search_info['search_paths'].append(base_path)
 
         # Add common search endpoints to try even if not discovered
-        common_search_paths = ['/search', '/catalogsearch/result', '/find', '/s']
+        common_search_paths = ('/search', '/catalogsearch/result', '/find', '/s')
         for path in common_search_paths:
             if path not in search_info['search_paths']:
                 search_info['search_paths'].append(path)
@@ -254,19 +488,47 @@ class WebsiteUser(HttpUser):
 
         return search_info
 
+    def _build_search_templates(self):
+        """
+        Expand the detected search paths and parameter names into URL templates
+        once, so search tasks only have to fill in the search terms. These are
+        %-style templates: a single positional substitution is the cheapest
+        formatting Python offers on the task path.
+        """
+        search_paths = self.search_info.get('search_paths', ())
+        self._search_templates = []
+        self._filtered_templates = []
+
+        for search_path in search_paths:
+            # Crawled paths are literal text in the templates
+            base = search_path.replace("%", "%%")
+            for param_name in self.search_info.get('search_params', ()):
+                # Handle different search path formats
+                if search_path == '/s':
+                    self._search_templates.append(f"{base}/%s")
+                else:
+                    self._search_templates.append(f"{base}?{param_name}=%s")
+                self._filtered_templates.append(f"{base}?{param_name}=%s&color=%s&size=%s")
+
+        # Choose appropriate search terms based on detected patterns
+        if any('catalog' in path.lower() for path in search_paths):
+            self._search_terms = SEARCH_QUERIES
+        else:
+            self._search_terms = GENERIC_SEARCH_TERMS
+
     @task(4)
     def visit_random_page(self):
         """
         A task that simulates a user visiting a random discovered page.
         """
         if self.discovered_urls:
-            path_to_visit = random.choice(self.discovered_urls)
-            try:
-                with self.client.get(path_to_visit, catch_response=True) as response:
-                    if response.status_code != 200:
-                        response.failure(f"Got status code {response.status_code}")
-            except Exception as e:
-                print(f"Request failed for {path_to_visit}: {e}")
+            if not self._page_batch:
+                self._page_batch = _choices(self.discovered_urls, k=SAMPLE_BATCH_SIZE)
+            path_to_visit = self._page_batch.pop()
+            # Locust records request errors itself, no need to log them here
+            with self.client.get(path_to_visit, catch_response=True) as response:
+                if response.status_code != 200:
+                    response.failure(f"Got status code {response.status_code}")
         else:
             # Fallback if no URLs discovered
             self.client.get("/")
@@ -305,132 +567,124 @@ class WebsiteUser(HttpUser):
         Simulates a user performing a basic search.
         Adapts to different search patterns found during crawling.
         """
-        if hasattr(self, 'search_info') and self.search_info.get('has_search'):
-            self._perform_detected_search()
-        else:
-            self._perform_common_search_patterns()
+        self._do_basic_search()
 
     @task(1)
     def search_with_filters(self):
         """
         Simulates a user searching with additional filters/parameters.
         """
-        if hasattr(self, 'search_info') and self.search_info.get('has_search'):
-            self._perform_filtered_search()
-        else:
-            self._perform_ecommerce_search()
+        self._do_filtered_search()
+
+    def _next_filters(self) -> tuple[str, str, str]:
+        """
+        Return a random (query, color, size) for a filtered search.
+
+        Values are sampled SAMPLE_BATCH_SIZE at a time with random.choices,
+        which is cheaper per value than separate random.choice calls.
+        """
+        if not self._filter_batch:
+            k = SAMPLE_BATCH_SIZE
+            self._filter_batch = list(zip(
+                _choices(SEARCH_QUERIES, k=k), _choices(COLORS, k=k), _choices(SIZES, k=k)
+            ))
+        return self._filter_batch.pop()
 
     def _perform_detected_search(self):
         """
         Perform search using patterns detected during crawling.
         """
-        search_path = random.choice(self.search_info['search_paths'])
-        param_name = random.choice(self.search_info['search_params'])
+        query = _choice(self._search_terms)
+        url = _choice(self._search_templates) % query
 
-        # Choose appropriate search terms based on detected patterns
-        if 'catalogsearch' in search_path.lower() or any('catalog' in path for path in self.search_info['search_paths']):
-            query = random.choice(SEARCH_QUERIES)
-        else:
-            query = random.choice(GENERIC_SEARCH_TERMS)
-
-        # Handle different search path formats
-        if search_path.endswith('/result') or '?' in search_path:
-            url = f"{search_path}?{param_name}={query}"
-        elif search_path == '/s':
-            url = f"{search_path}/{query}"
-        else:
-            url = f"{search_path}?{param_name}={query}"
-
-        try:
-            with self.client.get(url, catch_response=True, name="detected_search") as response:
-                if response.status_code == 404:
-                    response.failure("Search endpoint not found")
-                elif response.status_code >= 400:
-                    response.failure(f"Search failed with status {response.status_code}")
-        except Exception as e:
-            print(f"Detected search failed: {e}")
+        with self.client.get(url, catch_response=True, name="detected_search") as response:
+            if response.status_code == 404:
+                response.failure("Search endpoint not found")
+            elif response.status_code >= 400:
+                response.failure(f"Search failed with status {response.status_code}")
 
     def _perform_filtered_search(self):
         """
         Perform search with filters using detected patterns.
         """
-        search_path = random.choice(self.search_info['search_paths'])
-        param_name = random.choice(self.search_info['search_params'])
-
-        query = random.choice(SEARCH_QUERIES)
-        color = random.choice(COLORS)
-        size = random.choice(SIZES)
+        query, color, size = self._next_filters()
+        url = _choice(self._filtered_templates) % (query, color, size)
 
-        # Handle different search path formats
-        if search_path.endswith('/result') or '?' in search_path:
-            url = f"{search_path}?{param_name}={query}&color={color}&size={size}"
-        else:
-            url = f"{search_path}?{param_name}={query}&color={color}&size={size}"
-
-        try:
-            with self.client.get(url, catch_response=True, name="filtered_search") as response:
-                if response.status_code == 404:
-                    response.failure("Filtered search endpoint not found")
-                elif response.status_code >= 400:
-                    response.failure(f"Filtered search failed with status {response.status_code}")
-        except Exception as e:
-            print(f"Filtered search failed: {e}")
+        with self.client.get(url, catch_response=True, name="filtered_search") as response:
+            if response.status_code == 404:
+                response.failure("Filtered search endpoint not found")
+            elif response.status_code >= 400:
+                response.failure(f"Filtered search failed with status {response.status_code}")
 
     def _perform_common_search_patterns(self):
         """
         Try common search URL patterns when no specific pattern is detected.
         """
         # Use a mix of generic and ecommerce terms
-        query = random.choice(GENERIC_SEARCH_TERMS + SEARCH_QUERIES[:10])
+        query = _choice(MIXED_SEARCH_TERMS)
 
         # Try common search URL patterns
-        search_patterns = [
-            f"/search?q={query}",
-            f"/search/?query={query}",
-            f"/?s={query}",
-            f"/s/{query}",
-            f"/find?q={query}",
-            f"/catalogsearch/result/?q={query}"
-        ]
-
-        search_url = random.choice(search_patterns)
-        try:
-            with self.client.get(search_url, catch_response=True, name="generic_search") as response:
-                if response.status_code == 404:
-                    response.failure("Search endpoint not found")
-                elif response.status_code >= 400:
-                    response.failure(f"Search failed with status {response.status_code}")
-        except Exception as e:
-            print(f"Generic search failed: {e}")
+        search_url = _choice(COMMON_SEARCH_TEMPLATES).format(query=query)
+        with self.client.get(search_url, catch_response=True, name="generic_search") as response:
+            if response.status_code == 404:
+                response.failure("Search endpoint not found")
+            elif response.status_code >= 400:
+                response.failure(f"Search failed with status {response.status_code}")
 
     def _perform_ecommerce_search(self):
         """
         Perform ecommerce-style search with filters.
         """
-        query = random.choice(SEARCH_QUERIES)
-        color = random.choice(COLORS)
-        size = random.choice(SIZES)
+        query, color, size = self._next_filters()
 
         # Try common ecommerce search patterns
-        ecommerce_patterns = [
-            f"/catalogsearch/result/?q={query}",
-            f"/search?q={query}&color={color}&size={size}",
-            f"/products/search?query={query}&filters[color]={color}",
-            f"/shop?search={query}&color={color}&size={size}"
-        ]
-
-        search_url = random.choice(ecommerce_patterns)
-        try:
-            with self.client.get(search_url, catch_response=True, name="ecommerce_search") as response:
-                if response.status_code == 404:
-                    response.failure("Ecommerce search endpoint not found")
-                elif response.status_code >= 400:
-                    response.failure(f"Search failed with status {response.status_code}")
-        except Exception as e:
-            print(f"Ecommerce search failed: {e}")
+        search_url = _choice(ECOMMERCE_SEARCH_TEMPLATES).format(query=query, color=color, size=size)
+        with self.client.get(search_url, catch_response=True, name="ecommerce_search") as response:
+            if response.status_code == 404:
+                response.failure("Ecommerce search endpoint not found")
+            elif response.status_code >= 400:
+                response.failure(f"Search failed with status {response.status_code}")
 
     @task(1)
     def visit_homepage(self):
         """
         Occasionally visit the homepage to simulate typical user behavior.
         """
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    """
+    Let workers accept the crawl results broadcast by the master.
+    """
+    if isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message("crawl_results", on_crawl_results)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    """
+    Crawl the target once when the test starts, before any users spawn.
+
+    In distributed mode only the master crawls; the result is sent to the
+    workers ahead of the spawn messages, so their users never crawl.
+    """
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    host = environment.host or WebsiteUser.host
+    discovered_urls, static_assets, search_info = WebsiteUser.get_crawl_results(host)
+
+    if isinstance(environment.runner, MasterRunner):
+        environment.runner.send_message(
+            "crawl_results", [host, discovered_urls, static_assets, search_info]
+        )
+
+
+def on_crawl_results(environment, msg, **kwargs):
+    """
+    Store crawl results received from the master so users can reuse them.
+    """
+    host, discovered_urls, static_assets, search_info = msg.data
+    with WebsiteUser._crawl_lock:
+        WebsiteUser._crawl_cache[host] = (discovered_urls, static_assets, search_info)